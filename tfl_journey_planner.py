@@ -4,11 +4,24 @@
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import os
-import re
+import sys
+import time
+import threading
 from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from itertools import chain
+
+try:  # orjson decodes bytes in C, several times faster on large JourneyResults payloads
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+    _json_loads = json.loads
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Config
@@ -16,7 +29,36 @@ from urllib.parse import quote
 TFL_APP_KEY = os.environ.get("TFL_APP_KEY", "your_app_key_here")
 TFL_BASE_URL = "https://api.tfl.gov.uk"
 REQUEST_TIMEOUT = 10
+CACHE_TTL = 600            # seconds; suggestion/geocode lookups are stable
+JOURNEY_CACHE_TTL = 60     # seconds; journey plans depend on live service data
+CACHE_MAX_ENTRIES = 1024
+PREFETCH_WAIT = 5          # seconds Find Routes waits on an in-flight prefetch before requesting itself
+SUGGESTION_LIMIT = 10        # suggestion buttons shown per field
+# Per endpoint. Station names come back from both and dedupe_by_name merges them, so each endpoint
+# asks for a full SUGGESTION_LIMIT to keep the sidebar filled after the merge.
+TFL_SEARCH_MAX_RESULTS = SUGGESTION_LIMIT
+SEARCH_MIN_QUERY_LEN = 3     # 1-2 characters match too much of London to suggest anything useful
+# Whole-query words that never identify a place on their own; answered locally with no suggestions
+NOISE_QUERIES = frozenset({"the", "and", "to", "at", "in", "of", "on", "my", "st", "rd", "road", "street", "station"})
+NOMINATIM_MIN_INTERVAL = 1.0  # seconds; Nominatim usage policy is max 1 request/second
+NOMINATIM_MAX_WAIT = 2.0      # seconds an interactive geocode queues for a slot before giving up
+NOMINATIM_MIN_QUERY_LEN = 4   # shorter text geocodes to arbitrary matches and burns the 1 req/s slot
 UK_TZ = ZoneInfo("Europe/London")
+FROMISO_ACCEPTS_Z = sys.version_info >= (3, 11)  # older fromisoformat rejects a trailing 'Z'
+MODE_ICONS = {"tube": "🚇", "bus": "🚌", "walking": "🚶", "dlr": "🚊", "overground": "🚈", "elizabeth-line": "🚆", "national-rail": "🚂"}
+ACCESSIBILITY_LABELS_TO_VALUES = {
+    "No Requirements": "NoRequirements",
+    "No Solid Stairs": "NoSolidStairs",
+    "No Escalators": "NoEscalators",
+    "No Elevators": "NoElevators",
+    "Step-free to Vehicle": "StepFreeToVehicle",
+    "Step-free to Platform": "StepFreeToPlatform",
+}
+ACCESSIBILITY_DISPLAY_ORDER = list(ACCESSIBILITY_LABELS_TO_VALUES.keys())
+# Character classes for the UK postcode shape [A-Z]{1,2}[0-9][A-Z0-9]? ?[0-9][A-Z]{2}
+_PC_ALPHA = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+_PC_DIGIT = frozenset("0123456789")
+_PC_ALNUM = _PC_ALPHA | _PC_DIGIT
 
 st.set_page_config(page_title="TfL Journey Planner", page_icon="🚇", layout="wide")
 st.title("🚇 Transport for London Journey Planner")
@@ -26,150 +68,372 @@ st.caption("🕒 Note: All times shown here refer to **London time (Europe/Londo
 # ────────────────────────────────────────────────────────────────────────────────
 # Helpers
 # ────────────────────────────────────────────────────────────────────────────────
+@st.cache_resource
+def http_session() -> requests.Session:
+    """One pooled keep-alive session shared by all reruns/sessions (TfL + Nominatim)."""
+    s = requests.Session()
+    s.headers["User-Agent"] = "TfL-Journey-Planner-App"
+    # Retry transient gateway errors; the final response is returned so callers' status handling still applies.
+    # read=False: a read timeout already cost REQUEST_TIMEOUT, so don't repeat it, and re-raise it as
+    # ReadTimeout (read=0 would wrap it as a ConnectionError); ignore Retry-After so a 503 can't park
+    # the script for however long the server asks.
+    retry = Retry(
+        total=2, read=False, backoff_factor=0.2, status_forcelist=[502, 503, 504],
+        raise_on_status=False, respect_retry_after_header=False,
+    )
+    s.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry))
+    # No retries for Nominatim: each attempt would be an extra request past the 1 req/s gate
+    s.mount("https://nominatim.openstreetmap.org/", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+    return s
+
+def response_json(resp):
+    """Decode a response body with the fastest available JSON parser."""
+    return _json_loads(resp.content)
+
+def normalize_query(text: str) -> str:
+    """Cache key for free-text lookups: case- and whitespace-insensitive ("Euston " == "euston")."""
+    return " ".join(text.split()).lower()
+
 def is_postcode(text: str) -> bool:
+    # Fixed-position character checks; no regex engine or Match object on this hot path
     if not text:
         return False
-    pattern = r'^[A-Z]{1,2}[0-9][A-Z0-9]?\s?[0-9][A-Z]{2}$'
-    return bool(re.match(pattern, text.upper().strip()))
+    t = text.upper().strip()
+    if not 5 <= len(t) <= 8:
+        return False
+    if not (t[-3] in _PC_DIGIT and t[-2] in _PC_ALPHA and t[-1] in _PC_ALPHA):
+        return False
+    out = t[:-3]
+    if out[-1].isspace():
+        out = out[:-1]
+    n = len(out)
+    if n == 2:    # A9
+        return out[0] in _PC_ALPHA and out[1] in _PC_DIGIT
+    if n == 3:    # A9X or AA9
+        return out[0] in _PC_ALPHA and (
+            (out[1] in _PC_DIGIT and out[2] in _PC_ALNUM) or (out[1] in _PC_ALPHA and out[2] in _PC_DIGIT)
+        )
+    if n == 4:    # AA9X
+        return out[0] in _PC_ALPHA and out[1] in _PC_ALPHA and out[2] in _PC_DIGIT and out[3] in _PC_ALNUM
+    return False
+
+@st.cache_resource
+def _nominatim_gate():
+    # Process-wide: all sessions share one Nominatim allowance
+    return {"lock": threading.Lock(), "next_at": 0.0}
+
+def _take_nominatim_slot() -> bool:
+    """Reserve the next free Nominatim slot and sleep until it starts.
+    False only if the queue is longer than NOMINATIM_MAX_WAIT (several sessions geocoding at once)."""
+    gate = _nominatim_gate()
+    with gate["lock"]:
+        now = time.monotonic()
+        start = max(now, gate["next_at"])
+        if start - now > NOMINATIM_MAX_WAIT:
+            return False
+        gate["next_at"] = start + NOMINATIM_MIN_INTERVAL
+    # Slot is reserved; sleep outside the lock so later callers can queue behind it
+    if start > now:
+        time.sleep(start - now)
+    return True
+
+class LookupFailed(Exception):
+    """A lookup failed for a transient reason (rate limit, network, 5xx): retry it, never memoize it."""
 
 def geocode_address(address: str):
+    """Geocoded address dict, or None when Nominatim has no match. Raises LookupFailed on errors."""
+    key = normalize_query(address)
+    if len(key) < NOMINATIM_MIN_QUERY_LEN or key in NOISE_QUERIES:
+        return None
     try:
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {"q": f"{address}, London, UK", "format": "json", "limit": 1}
-        headers = {"User-Agent": "TfL-Journey-Planner-App"}
-        resp = requests.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
-        if resp.status_code == 429:
-            return None
-        resp.raise_for_status()
-        results = resp.json()
-        if results:
-            r0 = results[0]
-            return {
-                "name": address,
-                "display": r0.get("display_name", address)[:100],
-                "lat": float(r0.get("lat")),
-                "lon": float(r0.get("lon")),
-                "type": "Address",
-                "use_coords": True,
-            }
-    except Exception:
-        pass
+        geocoded = _geocode_cached(key)
+    except Exception as e:
+        # rate-limited / 429 / network errors: raised inside so they are never persisted
+        raise LookupFailed(f"geocode failed: {e}") from e
+    # name must echo the user's text: the sidebar compares it with the input box
+    return {**geocoded, "name": address} if geocoded else None
+
+# Persisted to disk so geocodes survive restarts (OSM addresses change slowly, and Nominatim
+# asks for minimal repeat traffic). Streamlit ignores ttl for persisted caches, so none is set.
+@st.cache_data(persist="disk", max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _geocode_cached(address: str):
+    if not _take_nominatim_slot():
+        raise RuntimeError("Nominatim rate limit")  # would be a 429; raising keeps it out of the cache
+    url = "https://nominatim.openstreetmap.org/search"
+    params = {
+        "q": f"{address}, London, UK",
+        "format": "json",
+        "limit": 1,
+        "countrycodes": "gb",
+        "addressdetails": 0,  # only lat/lon/display_name are read
+        "accept-language": "en",
+    }
+    resp = http_session().get(url, params=params, timeout=REQUEST_TIMEOUT)
+    resp.raise_for_status()
+    results = response_json(resp)
+    if results:
+        r0 = results[0]
+        display = r0.get("display_name", address)[:100]
+        return {
+            "name": address,
+            "display": display,
+            "display_short": display[:80],  # sidebar button label, sliced once per cache fill
+            "lat": float(r0.get("lat")),
+            "lon": float(r0.get("lon")),
+            "type": "Address",
+            "use_coords": True,
+        }
     return None
 
 def search_locations(query: str):
-    if not query or len(query) < 3:
+    """Place/Search suggestions ([] for no matches). Raises LookupFailed on timeouts, 5xx and bad payloads."""
+    if not query or len(query) < SEARCH_MIN_QUERY_LEN:
+        return []
+    key = normalize_query(query)
+    if key in NOISE_QUERIES:
         return []
     try:
-        url = f"{TFL_BASE_URL}/Place/Search"
-        params = {"query": query, "app_key": TFL_APP_KEY, "maxResults": 10}
-        resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-        if resp.status_code == 404:
-            return []
-        resp.raise_for_status()
-        results = resp.json()
-        out = []
-        for place in results:
-            name = place.get("name", "")
-            place_type = place.get("placeType", "")
-            lat, lon = place.get("lat"), place.get("lon")
-            out.append({
-                "display": f"{name} ({place_type})" if place_type else name,
-                "name": name,
-                "type": place_type or "Place",
-                "lat": lat,
-                "lon": lon,
-                "id": place.get("id", ""),
-                "use_coords": bool(lat and lon),
-            })
-        return out
-    except Exception:
+        return _search_locations_cached(key)
+    except Exception as e:
+        # errors raise inside the cached function, so they are not cached
+        raise LookupFailed(f"Place/Search failed: {e}") from e
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _search_locations_cached(query: str):
+    url = f"{TFL_BASE_URL}/Place/Search"
+    params = {"query": query, "app_key": TFL_APP_KEY, "maxResults": TFL_SEARCH_MAX_RESULTS}
+    resp = http_session().get(url, params=params, timeout=REQUEST_TIMEOUT)
+    if resp.status_code == 404:
         return []
+    resp.raise_for_status()
+    results = response_json(resp)
+    out = []
+    for place in results:
+        name = place.get("name", "")
+        place_type = place.get("placeType", "")
+        lat, lon = place.get("lat"), place.get("lon")
+        display = f"{name} ({place_type})" if place_type else name
+        out.append({
+            "display": display,
+            "display_short": display[:70],
+            "name": name,
+            "type": place_type or "Place",
+            "lat": lat,
+            "lon": lon,
+            "id": place.get("id", ""),
+            "use_coords": bool(lat and lon),
+        })
+    return out
 
 def search_stoppoints(query: str):
-    if not query or len(query) < 2:
+    """StopPoint/Search suggestions ([] for no matches). Raises LookupFailed on timeouts, 5xx and bad payloads."""
+    if not query or len(query) < SEARCH_MIN_QUERY_LEN:
+        return []
+    key = normalize_query(query)
+    if key in NOISE_QUERIES:
         return []
     try:
-        url = f"{TFL_BASE_URL}/StopPoint/Search"
-        params = {"query": query, "app_key": TFL_APP_KEY, "maxResults": 10}
-        resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-        if resp.status_code == 404:
-            return []
-        resp.raise_for_status()
-        data = resp.json()
-        out = []
-        for match in data.get("matches", []):
-            name = match.get("name", "")
-            modes = ", ".join(match.get("modes", []))
-            lat, lon = match.get("lat"), match.get("lon")
-            out.append({
-                "display": f"{name} [{modes}]" if modes else name,
-                "name": name,
-                "type": "Stop",
-                "lat": lat,
-                "lon": lon,
-                "id": match.get("id", ""),
-                "use_coords": bool(lat and lon),
-            })
-        return out
-    except Exception:
+        return _search_stoppoints_cached(key)
+    except Exception as e:
+        # errors raise inside the cached function, so they are not cached
+        raise LookupFailed(f"StopPoint/Search failed: {e}") from e
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _search_stoppoints_cached(query: str):
+    url = f"{TFL_BASE_URL}/StopPoint/Search"
+    params = {"query": query, "app_key": TFL_APP_KEY, "maxResults": TFL_SEARCH_MAX_RESULTS}
+    resp = http_session().get(url, params=params, timeout=REQUEST_TIMEOUT)
+    if resp.status_code == 404:
         return []
-
-def resolve_location(query_text: str):
+    resp.raise_for_status()
+    data = response_json(resp)
+    out = []
+    for match in data.get("matches", []):
+        name = match.get("name", "")
+        modes = ", ".join(match.get("modes", []))
+        lat, lon = match.get("lat"), match.get("lon")
+        display = f"{name} [{modes}]" if modes else name
+        out.append({
+            "display": display,
+            "display_short": display[:70],
+            "name": name,
+            "type": "Stop",
+            "lat": lat,
+            "lon": lon,
+            "id": match.get("id", ""),
+            "use_coords": bool(lat and lon),
+        })
+    return out
+
+def dedupe_by_name(suggestions, limit: int = SUGGESTION_LIMIT):
+    """First suggestion per non-empty name (case-insensitive), in order, stopping at `limit`."""
+    unique = {}
+    for s in suggestions:
+        name = s.get("name")
+        if name:
+            unique.setdefault(name.lower(), s)
+            if len(unique) >= limit:
+                break
+    return list(unique.values())
+
+@st.cache_resource
+def _lookup_pool():
+    # Shared across reruns/sessions; lookups are I/O-bound so threads overlap the round-trips.
+    return ThreadPoolExecutor(max_workers=6, thread_name_prefix="tfl-lookup")
+
+@st.cache_resource
+def _journey_pool():
+    # JourneyResults calls (prefetch, relaxed fallback) are slow; keep them off the lookup pool
+    # so they never delay anyone's sidebar suggestions or Find Routes resolution.
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="tfl-journey")
+
+def has_strong_match(query: str, suggestions) -> bool:
+    """True if any suggestion's name starts with the (normalized) query."""
+    prefix = normalize_query(query)
+    return any(s.get("name", "").lower().startswith(prefix) for s in suggestions)
+
+def fetch_suggestions(query: str, include_address: bool = True):
+    """Run Place/Search and StopPoint/Search concurrently; geocode with Nominatim (optionally)
+    only when TfL has no name starting with the query.
+    Returns (places, stops, geocoded, complete); complete is False if any lookup failed."""
+    pool = _lookup_pool()
+    futures = [pool.submit(search_locations, query), pool.submit(search_stoppoints, query)]
+    complete = True
+    found = []
+    for f in futures:
+        try:
+            found.append(f.result())
+        except LookupFailed:
+            found.append([])  # still show whatever the other endpoint returned
+            complete = False
+    places, stops = found
+    geocoded = None
+    # Nominatim is the slow, 1 req/s hop; station/landmark names don't need it
+    if include_address and not has_strong_match(query, chain(places, stops)):
+        try:
+            geocoded = geocode_address(query)
+        except LookupFailed:
+            complete = False
+    return places, stops, geocoded, complete
+
+def resolve_location(query_text: str, memo: dict = None):
+    """Best match for free text. Reuses the sidebar's suggestion memo when its query matches.
+    Touches no session state, so it is safe to run on a worker thread."""
     if not query_text:
         return None
     if is_postcode(query_text):
-        return {"name": query_text.upper(), "display": query_text.upper(), "type": "Postcode", "use_coords": False}
-    places = search_locations(query_text)
-    stops = search_stoppoints(query_text)
-    candidates = places + stops
-    if candidates:
-        return candidates[0]
-    return geocode_address(query_text)
+        postcode = query_text.upper()
+        return {"name": postcode, "display": postcode, "type": "Postcode", "use_coords": False}
+    if memo and memo["query"] == query_text:
+        places, stops, geocoded = memo["results"]
+    else:
+        places, stops, _, _ = fetch_suggestions(query_text, include_address=False)
+        geocoded = None
+    best = next(chain(places, stops), None)
+    if best:
+        return best
+    if geocoded:
+        return geocoded
+    try:
+        return geocode_address(query_text)
+    except LookupFailed:
+        return None
 
 # Safe programmatic text_input update: set *_pending, rerun; next run applies BEFORE widget creation.
-def _select_origin(name: str, payload: dict):
-    st.session_state.origin_selected = payload
-    st.session_state.origin_query = name
-    st.session_state.origin_input_pending = name
+def _select(field: str, name: str, payload: dict):
+    st.session_state[f"{field}_selected"] = payload
+    st.session_state[f"{field}_query"] = name
+    st.session_state[f"{field}_input_pending"] = name
     st.session_state.last_results = None
     st.rerun()
 
-def _select_destination(name: str, payload: dict):
-    st.session_state.destination_selected = payload
-    st.session_state.destination_query = name
-    st.session_state.destination_input_pending = name
-    st.session_state.last_results = None
-    st.rerun()
+# Debounce: text_input commits on Enter/blur, but any other widget change also reruns the
+# script. Only hit the lookups when the committed text for a field actually changes.
+def sidebar_suggestions(field: str, query: str):
+    """Return (places, stops, geocoded) for `field` ("origin"/"destination"), memoized on the last query.
+    Results with a failed lookup are shown but not memoized, so the next rerun retries them."""
+    memo = st.session_state.get(f"{field}_suggestions")
+    if memo and memo["query"] == query:
+        return memo["results"]
+    places, stops, geocoded, complete = fetch_suggestions(query)  # callers handle complete postcodes without lookups
+    results = (places, stops, geocoded)
+    if complete:
+        st.session_state[f"{field}_suggestions"] = {"query": query, "results": results}
+    return results
+
+def location_param(loc: dict) -> str:
+    """JourneyResults path segment for a location: "lat,lon" when coordinates are usable, else its name."""
+    if loc.get("use_coords") and loc.get("lat") and loc.get("lon"):
+        # 4 dp (~11 m) is ample for routing and lets nearby picks share a journey cache entry
+        return f"{float(loc['lat']):.4f},{float(loc['lon']):.4f}"
+    return loc["name"]
+
+def journey_url(origin_loc: dict, dest_loc: dict) -> str:
+    # Encoded only on "Find Routes"; sort/option reruns render from last_results without rebuilding this.
+    origin_encoded = quote(location_param(origin_loc), safe="")
+    dest_encoded = quote(location_param(dest_loc), safe="")
+    return f"{TFL_BASE_URL}/Journey/JourneyResults/{origin_encoded}/to/{dest_encoded}"
+
+def journey_params(modes, time_option: str, when, accessibility_labels) -> dict:
+    """JourneyResults query parameters for the sidebar's current preferences."""
+    params = {"app_key": TFL_APP_KEY, "mode": ",".join(modes) if modes else "tube,walking"}
+    if time_option in ("Arrive by", "Depart at") and when:
+        params["timeIs"] = "arriving" if time_option == "Arrive by" else "departing"
+        params["date"] = when.strftime("%Y%m%d")
+        params["time"] = when.strftime("%H%M")
+        params["calcOneDirection"] = "true"
+    if accessibility_labels:
+        params["accessibilityPreference"] = ",".join(ACCESSIBILITY_LABELS_TO_VALUES[l] for l in accessibility_labels)
+    return params
+
+class TransientRequestError(Exception):
+    """Carries an error_info dict out of a cached fetch so st.cache_data does not store it."""
 
 def request_journeys(url, params):
-    """Return (json, error_info). error_info is None on success."""
+    """Return (json, error_info). error_info is None on success.
+    Answers, including 4xx such as "no journey found", are cached per url+params as negative
+    results; timeouts, connection errors, 408/429 and 5xx are not, so the next click retries."""
     try:
-        resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-        if resp.status_code == 404:
-            try:
-                err = resp.json()
-            except Exception:
-                err = {"message": "No journey found for your inputs."}
-            return None, {"status": 404, "message": err.get("message", "No journey found.")}
-        resp.raise_for_status()
-        return resp.json(), None
-    except requests.exceptions.HTTPError as e:
-        try:
-            err_body = e.response.json()
-            msg = err_body.get("message") or e.response.text
-        except Exception:
-            msg = str(e)
-        return None, {"status": e.response.status_code if e.response else None, "message": msg}
+        return _request_journeys_cached(url, params)
+    except TransientRequestError as e:
+        return None, e.args[0]
+
+@st.cache_data(ttl=JOURNEY_CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _request_journeys_cached(url, params):
+    try:
+        resp = http_session().get(url, params=params, timeout=REQUEST_TIMEOUT)
     except requests.exceptions.Timeout:
-        return None, {"status": "timeout", "message": "Request timed out."}
+        raise TransientRequestError({"status": "timeout", "message": "Request timed out."})
     except Exception as e:
-        return None, {"status": "exception", "message": str(e)}
+        # Not str(e): requests' messages embed the request URL, app_key included, and this is shown on screen
+        raise TransientRequestError({"status": "exception", "message": f"Could not reach TfL ({type(e).__name__})."})
+
+    status = resp.status_code
+    if status < 400:
+        try:
+            return response_json(resp), None
+        except ValueError as e:
+            raise TransientRequestError({"status": "exception", "message": str(e)})
+
+    # Error path: one status branch, no HTTPError raise/unwind
+    try:
+        err_body = response_json(resp)
+    except ValueError:
+        err_body = {}
+    if not isinstance(err_body, dict):
+        err_body = {}
+    if status == 404:
+        return None, {"status": 404, "message": err_body.get("message", "No journey found.")}
+    err = {"status": status, "message": err_body.get("message") or resp.text[:500]}
+    if status >= 500 or status in (408, 429):  # server trouble, request timeout, throttling
+        raise TransientRequestError(err)
+    return None, err
 
 # Small helpers used in sorting / UI metrics
 def walking_minutes(j):
     total = 0
     for leg in (j.get("legs") or []):
-        if leg.get("mode", {}).get("id") == "walking":
+        if (leg.get("mode") or {}).get("id") == "walking":  # "mode" can be null, not just missing
             total += int(leg.get("duration", 0) or 0)
     return total
 
@@ -178,7 +442,57 @@ def journey_changes(j):
     return max(len(legs) - 1, 0)
 
 def fare_pence(j):
-    return j.get("fare", {}).get("totalCost")  # may be None
+    return (j.get("fare") or {}).get("totalCost")  # may be None
+
+def to_london(iso: str) -> datetime:
+    """TfL ISO timestamp (UTC, may end in 'Z') → aware datetime in London time."""
+    if not FROMISO_ACCEPTS_Z and iso.endswith("Z"):
+        iso = iso[:-1] + "+00:00"
+    return datetime.fromisoformat(iso).astimezone(UK_TZ)
+
+def journey_metrics(j):
+    """Per-journey figures computed once and reused by sorting and rendering."""
+    arrival = to_london(j["arrivalDateTime"])
+    return {
+        "duration": j.get("duration", 10**9),
+        "changes": journey_changes(j),
+        "walking": walking_minutes(j),
+        "fare": fare_pence(j),
+        "arrival_ts": arrival.timestamp(),  # for dominance: an earlier arrival is worth a longer ride
+        "arrives": arrival.strftime("%H:%M"),
+        "date": to_london(j["startDateTime"]).strftime("%a, %d %b %Y"),
+    }
+
+def _fare_sort(m):
+    return m["fare"] if isinstance(m["fare"], int) else 10**9  # missing fare → last
+
+def pareto_front(metrics):
+    """Indices of journeys not dominated on (duration, walking, fare, changes, arrival time);
+    missing fare counts as worst. Arrival keeps an earlier departure that gets in sooner."""
+    vecs = [
+        (m["duration"], m["walking"], _fare_sort(m), m["changes"], m["arrival_ts"])
+        for m in metrics
+    ]
+
+    def dominates(a, b):
+        return a != b and all(x <= y for x, y in zip(a, b))
+
+    return [i for i, v in enumerate(vecs) if not any(dominates(w, v) for w in vecs)]
+
+# Sort option label → key over a metrics dict (ties broken by the remaining criteria)
+SORT_KEYS = {
+    "Fastest": lambda m: (m["duration"], m["changes"], m["walking"]),
+    "Cheapest": lambda m: (_fare_sort(m), m["duration"], m["changes"], m["walking"]),
+    "Least Walking": lambda m: (m["walking"], m["duration"], m["changes"]),
+}
+
+def sort_orders(metrics):
+    """Journey indices pre-sorted for every sort option, so toggling the sort is a lookup."""
+    orders = {}
+    for label, key in SORT_KEYS.items():
+        decorated = [key(m) for m in metrics]  # one key tuple per journey; sort compares via C-level __getitem__
+        orders[label] = sorted(range(len(metrics)), key=decorated.__getitem__)
+    return orders
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Session state init
@@ -190,10 +504,15 @@ for key, default in [
     ("destination_query", ""),
     ("origin_input", ""),
     ("destination_input", ""),
+    ("origin_suggestions", None),       # {"query": str, "results": (places, stops, geocoded)}
+    ("destination_suggestions", None),
     ("journey_time_option", "Leave now"),
     ("journey_datetime_uk", None),
     ("sort_option", "Fastest"),
-    ("last_results", None),   # {"journeys": [...], "origin_loc": {...}, "dest_loc": {...}, "relaxed": bool, "generated_at": str}
+    ("show_all_routes", False),
+    ("expanded_routes", set()),   # journey indices whose details were requested
+    ("journey_prefetch", None),   # {"key": (url, params), "future": Future} warming the journey cache
+    ("last_results", None),   # {"journeys": [...], "metrics": [...], "orders": {label: [idx]}, "front": [idx], "origin_loc": {...}, "dest_loc": {...}, "relaxed": bool, "generated_at": str}
 ]:
     if key not in st.session_state:
         st.session_state[key] = default
@@ -210,142 +529,83 @@ if "destination_input_pending" in st.session_state:
 # ────────────────────────────────────────────────────────────────────────────────
 # Sidebar UI
 # ────────────────────────────────────────────────────────────────────────────────
-with st.sidebar:
-    st.header("Journey Details")
-
-    # ── Origin
-    st.subheader("📍 From")
-    origin_input = st.text_input(
-        "Origin:",
-        value=st.session_state.origin_input,
+def render_endpoint(field: str, heading: str, label: str, key_prefix: str, example: str):
+    """Input box, suggestion buttons and selection badge for one end of the journey.
+    `field` is "origin"/"destination" (session_state prefix); `key_prefix` keeps widget keys stable."""
+    st.subheader(heading)
+    text = st.text_input(
+        label,
+        value=st.session_state[f"{field}_input"],
         placeholder="Station, postcode, or address",
-        key="origin_input"
+        key=f"{field}_input"
     )
-    if st.session_state.origin_selected and origin_input != st.session_state.origin_selected.get("name", ""):
-        st.session_state.origin_selected = None
+    selected = st.session_state[f"{field}_selected"]
+    if selected and text != selected.get("name", ""):
+        selected = st.session_state[f"{field}_selected"] = None
         st.session_state.last_results = None
 
-    if origin_input and len(origin_input) >= 2:
-        if origin_input != st.session_state.origin_query:
-            st.session_state.origin_query = origin_input
+    # Track the box at any length: Find Routes resolves this text, never an older, longer query
+    if text != st.session_state[f"{field}_query"]:
+        st.session_state[f"{field}_query"] = text
+
+    # Once a suggestion is picked the box holds its name; looking that up again would only
+    # spend a TfL round-trip pair on the rerun after every selection.
+    if text and len(text) >= SEARCH_MIN_QUERY_LEN and not selected:
         with st.spinner("Searching..."):
             found_something = False
 
-            if is_postcode(origin_input):
+            if is_postcode(text):
+                # A complete postcode is routable as-is; skip the Place/StopPoint/Nominatim lookups
                 found_something = True
+                postcode = text.upper()
                 st.markdown("**📮 Postcode:**")
-                if st.button(f"📍 {origin_input.upper()}", key="origin_postcode", use_container_width=True, type="primary"):
-                    _select_origin(origin_input.upper(), {"name": origin_input.upper(), "display": origin_input.upper(), "type": "Postcode", "use_coords": False})
-
-            place_suggestions = search_locations(origin_input)
-            stop_suggestions = search_stoppoints(origin_input)
-            all_suggestions = place_suggestions + stop_suggestions
-            seen = set(); unique_suggestions = []
-            for s in all_suggestions:
-                n = s.get("name", "")
-                if n and n not in seen:
-                    seen.add(n); unique_suggestions.append(s)
-
-            if unique_suggestions:
-                found_something = True
-                st.markdown("**🚇 Stations & Places:**")
-                for idx, suggestion in enumerate(unique_suggestions[:10]):
-                    if st.button(f"{suggestion['display'][:70]}", key=f"origin_sugg_{idx}", use_container_width=True):
-                        _select_origin(suggestion["name"], suggestion)
+                if st.button(f"📍 {postcode}", key=f"{key_prefix}_postcode", use_container_width=True, type="primary"):
+                    _select(field, postcode, {"name": postcode, "display": postcode, "type": "Postcode", "use_coords": False})
+            else:
+                place_suggestions, stop_suggestions, geocoded = sidebar_suggestions(field, text)
+                unique_suggestions = dedupe_by_name(chain(place_suggestions, stop_suggestions))
 
-            if not is_postcode(origin_input):
-                geocoded = geocode_address(origin_input)
-                if geocoded:
+                if unique_suggestions:
                     found_something = True
-                    st.markdown("**🗺️ Address:**")
-                    if st.button(f"📍 {geocoded['display'][:80]}", key="origin_geocoded", use_container_width=True, type="secondary"):
-                        _select_origin(origin_input, geocoded)
+                    st.markdown("**🚇 Stations & Places:**")
+                    for idx, suggestion in enumerate(unique_suggestions):
+                        if st.button(suggestion["display_short"], key=f"{key_prefix}_sugg_{idx}", use_container_width=True):
+                            _select(field, suggestion["name"], suggestion)
 
-            if not found_something:
-                st.warning("⚠️ Location not found")
-                st.info("Try: 'Euston', 'NW1 2JH', or 'London Eye'")
-
-    if st.session_state.origin_selected:
-        st.success(f"✓ {st.session_state.origin_selected['name']}")
-        if st.button("❌ Clear", key="clear_origin", use_container_width=True):
-            st.session_state.origin_selected = None
-            st.session_state.origin_query = ""
-            st.session_state.origin_input_pending = ""
-            st.session_state.last_results = None
-            st.rerun()
-
-    st.markdown("---")
-
-    # ── Destination
-    st.subheader("📍 To")
-    destination_input = st.text_input(
-        "Destination:",
-        value=st.session_state.destination_input,
-        placeholder="Station, postcode, or address",
-        key="destination_input"
-    )
-    if st.session_state.destination_selected and destination_input != st.session_state.destination_selected.get("name", ""):
-        st.session_state.destination_selected = None
-        st.session_state.last_results = None
-
-    if destination_input and len(destination_input) >= 2:
-        if destination_input != st.session_state.destination_query:
-            st.session_state.destination_query = destination_input
-        with st.spinner("Searching..."):
-            found_something = False
-
-            if is_postcode(destination_input):
-                found_something = True
-                st.markdown("**📮 Postcode:**")
-                if st.button(f"📍 {destination_input.upper()}", key="dest_postcode", use_container_width=True, type="primary"):
-                    _select_destination(destination_input.upper(), {"name": destination_input.upper(), "display": destination_input.upper(), "type": "Postcode", "use_coords": False})
-
-            place_suggestions = search_locations(destination_input)
-            stop_suggestions = search_stoppoints(destination_input)
-            all_suggestions = place_suggestions + stop_suggestions
-            seen = set(); unique_suggestions = []
-            for s in all_suggestions:
-                n = s.get("name", "")
-                if n and n not in seen:
-                    seen.add(n); unique_suggestions.append(s)
-
-            if unique_suggestions:
-                found_something = True
-                st.markdown("**🚇 Stations & Places:**")
-                for idx, suggestion in enumerate(unique_suggestions[:10]):
-                    if st.button(f"{suggestion['display'][:70]}", key=f"dest_sugg_{idx}", use_container_width=True):
-                        _select_destination(suggestion["name"], suggestion)
-
-            if not is_postcode(destination_input):
-                geocoded = geocode_address(destination_input)
                 if geocoded:
                     found_something = True
                     st.markdown("**🗺️ Address:**")
-                    if st.button(f"📍 {geocoded['display'][:80]}", key="dest_geocoded", use_container_width=True, type="secondary"):
-                        _select_destination(destination_input, geocoded)
+                    if st.button(f"📍 {geocoded['display_short']}", key=f"{key_prefix}_geocoded", use_container_width=True, type="secondary"):
+                        _select(field, text, geocoded)
 
             if not found_something:
                 st.warning("⚠️ Location not found")
-                st.info("Try: 'Liverpool Street', 'EC2M 7PP', or 'Tower Bridge'")
-
-    if st.session_state.destination_selected:
-        st.success(f"✓ {st.session_state.destination_selected['name']}")
-        if st.button("❌ Clear", key="clear_dest", use_container_width=True):
-            st.session_state.destination_selected = None
-            st.session_state.destination_query = ""
-            st.session_state.destination_input_pending = ""
+                st.info(example)
+
+    if st.session_state[f"{field}_selected"]:
+        st.success(f"✓ {st.session_state[f'{field}_selected']['name']}")
+        if st.button("❌ Clear", key=f"clear_{key_prefix}", use_container_width=True):
+            st.session_state[f"{field}_selected"] = None
+            st.session_state[f"{field}_query"] = ""
+            st.session_state[f"{field}_input_pending"] = ""
             st.session_state.last_results = None
             st.rerun()
 
+with st.sidebar:
+    st.header("Journey Details")
+
+    render_endpoint("origin", "📍 From", "Origin:", "origin", "Try: 'Euston', 'NW1 2JH', or 'London Eye'")
+    st.markdown("---")
+    render_endpoint("destination", "📍 To", "Destination:", "dest", "Try: 'Liverpool Street', 'EC2M 7PP', or 'Tower Bridge'")
     st.markdown("---")
 
     # ── Time (Europe/London)
     st.subheader("🕐 When?")
-    uk_now = datetime.now(UK_TZ)
     time_option = st.radio("Travel time:", ["Leave now", "Arrive by", "Depart at"])
     st.session_state.journey_time_option = time_option
 
     if time_option != "Leave now":
+        uk_now = datetime.now(UK_TZ)  # widget defaults only; "Leave now" never needs the clock
         journey_date = st.date_input("Date:", uk_now.date(), key="jp_date")
         journey_time = st.time_input("Time:", uk_now.time().replace(second=0, microsecond=0), key="jp_time")
         st.session_state.journey_datetime_uk = datetime.combine(journey_date, journey_time, tzinfo=UK_TZ)
@@ -359,15 +619,6 @@ with st.sidebar:
         ["tube", "bus", "dlr", "overground", "elizabeth-line", "national-rail", "walking"],
         default=["tube", "bus", "walking"]
     )
-    ACCESSIBILITY_LABELS_TO_VALUES = {
-        "No Requirements": "NoRequirements",
-        "No Solid Stairs": "NoSolidStairs",
-        "No Escalators": "NoEscalators",
-        "No Elevators": "NoElevators",
-        "Step-free to Vehicle": "StepFreeToVehicle",
-        "Step-free to Platform": "StepFreeToPlatform",
-    }
-    ACCESSIBILITY_DISPLAY_ORDER = list(ACCESSIBILITY_LABELS_TO_VALUES.keys())
     accessibility_selected_labels = st.multiselect(
         "♿ Accessibility preferences:",
         ACCESSIBILITY_DISPLAY_ORDER,
@@ -379,14 +630,44 @@ with st.sidebar:
     search_button = st.button("🔍 Find Routes", type="primary", use_container_width=True)
 
 # ────────────────────────────────────────────────────────────────────────────────
-# Fetch logic (only when user clicks)
+# Fetch logic (prefetched once both ends are picked; results only when user clicks)
 # ────────────────────────────────────────────────────────────────────────────────
+# Polite prefetch: once both ends are picked for a "Leave now" trip, warm the journey cache in
+# the background so Find Routes usually finds its answer waiting. One request per distinct query,
+# and none while results are on screen (tweaking modes there shouldn't fetch behind the user's back).
+if (
+    not search_button
+    and not st.session_state.last_results
+    and st.session_state.origin_selected
+    and st.session_state.destination_selected
+    and st.session_state.journey_time_option == "Leave now"
+    and not accessibility_selected_labels
+):
+    prefetch_url = journey_url(st.session_state.origin_selected, st.session_state.destination_selected)
+    prefetch_params = journey_params(modes, "Leave now", None, None)
+    prefetch_key = (prefetch_url, tuple(prefetch_params.items()))
+    prefetch = st.session_state.journey_prefetch
+    if not prefetch or prefetch["key"] != prefetch_key:
+        st.session_state.journey_prefetch = {
+            "key": prefetch_key,
+            "future": _journey_pool().submit(request_journeys, prefetch_url, prefetch_params),
+        }
+
 if search_button:
-    # Auto-resolve if the user typed but didn't click a suggestion
-    if not st.session_state.origin_selected and st.session_state.origin_query:
-        st.session_state.origin_selected = resolve_location(st.session_state.origin_query)
-    if not st.session_state.destination_selected and st.session_state.destination_query:
-        st.session_state.destination_selected = resolve_location(st.session_state.destination_query)
+    # Auto-resolve if the user typed but didn't click a suggestion (both ends in parallel).
+    # Own short-lived pool: resolve_location itself waits on _lookup_pool() tasks.
+    to_resolve = [
+        field for field in ("origin", "destination")
+        if not st.session_state[f"{field}_selected"] and st.session_state[f"{field}_query"]
+    ]
+    if to_resolve:
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            futures = {
+                field: ex.submit(resolve_location, st.session_state[f"{field}_query"], st.session_state[f"{field}_suggestions"])
+                for field in to_resolve
+            }
+        for field, fut in futures.items():
+            st.session_state[f"{field}_selected"] = fut.result()
 
     if not st.session_state.origin_selected or not st.session_state.destination_selected:
         st.error("⚠️ Please select valid origin and destination (or choose from suggestions).")
@@ -395,50 +676,51 @@ if search_button:
             origin_loc = st.session_state.origin_selected
             dest_loc = st.session_state.destination_selected
 
-            origin_str = f"{origin_loc['lat']},{origin_loc['lon']}" if origin_loc.get("use_coords") and origin_loc.get("lat") and origin_loc.get("lon") else origin_loc["name"]
-            dest_str = f"{dest_loc['lat']},{dest_loc['lon']}" if dest_loc.get("use_coords") and dest_loc.get("lat") and dest_loc.get("lon") else dest_loc["name"]
-
-            origin_encoded = quote(origin_str, safe="")
-            dest_encoded = quote(dest_str, safe="")
-            url = f"{TFL_BASE_URL}/Journey/JourneyResults/{origin_encoded}/to/{dest_encoded}"
-
-            params = {"app_key": TFL_APP_KEY, "mode": ",".join(modes) if modes else "tube,walking"}
-
-            time_option = st.session_state.get("journey_time_option", "Leave now")
-            journey_datetime_uk = st.session_state.get("journey_datetime_uk")
-            if time_option == "Arrive by" and journey_datetime_uk:
-                params["timeIs"] = "arriving"
-                params["date"] = journey_datetime_uk.strftime("%Y%m%d")
-                params["time"] = journey_datetime_uk.strftime("%H%M")
-                params["calcOneDirection"] = "true"
-            elif time_option == "Depart at" and journey_datetime_uk:
-                params["timeIs"] = "departing"
-                params["date"] = journey_datetime_uk.strftime("%Y%m%d")
-                params["time"] = journey_datetime_uk.strftime("%H%M")
-                params["calcOneDirection"] = "true"
-
-            selected_values = []
-            if accessibility_selected_labels:
-                selected_values = [ACCESSIBILITY_LABELS_TO_VALUES[l] for l in accessibility_selected_labels]
-                params["accessibilityPreference"] = ",".join(selected_values)
-
-            data, err = request_journeys(url, params)
+            url = journey_url(origin_loc, dest_loc)
+            params = journey_params(
+                modes,
+                st.session_state.get("journey_time_option", "Leave now"),
+                st.session_state.get("journey_datetime_uk"),
+                accessibility_selected_labels,
+            )
+
+            prefetch = st.session_state.journey_prefetch
+            if prefetch and prefetch["key"] == (url, tuple(params.items())):
+                # Let the in-flight prefetch land in the cache rather than racing it with a duplicate.
+                # Its result is not reused directly: request_journeys() below retries if it was transient.
+                try:
+                    prefetch["future"].result(timeout=PREFETCH_WAIT)
+                except FutureTimeout:
+                    pass  # stuck prefetch: request directly rather than wait out its retries
 
             relaxed = False
-            if err and err.get("status") == 404 and selected_values:
-                relaxed = True
+            if "accessibilityPreference" in params:
+                # Fire the relaxed (no accessibility filter) fallback alongside the strict request,
+                # so a 404 on the strict one doesn't cost a second serial round-trip.
                 params_relaxed = dict(params)
                 params_relaxed.pop("accessibilityPreference", None)
-                data, err = request_journeys(url, params_relaxed)
+                # The strict request runs here, so it never queues behind other sessions' prefetches.
+                relaxed_f = _journey_pool().submit(request_journeys, url, params_relaxed)  # not awaited unless needed
+                data, err = request_journeys(url, params)
+                if err and err.get("status") == 404:
+                    relaxed = True
+                    data, err = relaxed_f.result()
+            else:
+                data, err = request_journeys(url, params)
 
             if data and data.get("journeys"):
+                metrics = [journey_metrics(j) for j in data["journeys"]]  # parsed once; re-sorts reuse
                 st.session_state.last_results = {
                     "journeys": data["journeys"],
+                    "metrics": metrics,
+                    "orders": sort_orders(metrics),
+                    "front": pareto_front(metrics),
                     "origin_loc": origin_loc,
                     "dest_loc": dest_loc,
                     "relaxed": relaxed,
                     "generated_at": datetime.now(UK_TZ).strftime("%Y-%m-%d %H:%M %Z"),
                 }
+                st.session_state.expanded_routes = set()
                 # keep current sort selection; default is already "Fastest"
             else:
                 st.session_state.last_results = None
@@ -465,6 +747,53 @@ if search_button:
 # ────────────────────────────────────────────────────────────────────────────────
 # Results rendering (from cache so sorting is instant)
 # ────────────────────────────────────────────────────────────────────────────────
+def render_journey_details(journey, m):
+    """Metrics row, leg-by-leg steps and fare for one journey (expander body)."""
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("⏱️ Duration", f"{journey['duration']} mins")
+    with col2:
+        st.metric("🕐 Arrives", m["arrives"])
+    with col3:
+        st.metric("🔄 Changes", m["changes"])
+    with col4:
+        st.metric("🚶 Walking", f"{m['walking']} min")
+
+    st.caption(f"Date: {m['date']} (London)")
+    st.markdown("---")
+
+    # All legs go out as one markdown element instead of ~6 Streamlit calls per leg
+    parts = []
+    legs = journey.get("legs") or []
+    n_legs = len(legs)
+    for leg_idx, leg in enumerate(legs, 1):
+        mode = leg.get("mode") or {}
+        mode_name = mode.get("name", "Unknown")
+        icon = MODE_ICONS.get(mode.get("id", ""), "🚉")
+        parts.append(f"### {icon} Step {leg_idx}: {mode_name.title()}")
+
+        if "departurePoint" in leg:
+            parts.append(f"**From:** {leg['departurePoint'].get('commonName', 'N/A')}")
+        if "instruction" in leg:
+            parts.append(f"*{leg['instruction'].get('summary', '')}*")
+        if leg.get("duration"):
+            parts.append(f"⏱️ {leg['duration']} minutes")
+        if "arrivalPoint" in leg:
+            parts.append(f"**To:** {leg['arrivalPoint'].get('commonName', 'N/A')}")
+
+        if leg_idx < n_legs:
+            parts.append("⬇️")
+    if parts:
+        st.markdown("\n\n".join(parts))
+
+    # Fare section with friendly fallback
+    st.markdown("---")
+    st.markdown("### 💷 Fare")
+    if isinstance(m["fare"], int):
+        st.write(f"**Total:** £{m['fare']/100:.2f}")
+    else:
+        st.write("Fare Information Not Available")
+
 cached = st.session_state.get("last_results")
 if cached and cached.get("journeys"):
     origin_loc = cached["origin_loc"]
@@ -479,78 +808,36 @@ if cached and cached.get("journeys"):
     st.caption(f"🕒 All times below are in **London time** • Data generated at {cached.get('generated_at')}")
 
     # Sorting control (persistent via key; no index so Streamlit respects session value)
-    sort_labels = ["Fastest", "Cheapest", "Least Walking"]
-    st.radio("🔎 Sort results by", sort_labels, key="sort_option", horizontal=True)
-
-    # Prepare sorted journeys
-    def sort_key(j):
-        dur  = j.get("duration", 10**9)
-        chg  = journey_changes(j)
-        walk = walking_minutes(j)
-        fare = fare_pence(j)
-        fare_sort = fare if isinstance(fare, int) else 10**9  # missing fare → last
-        so = st.session_state.get("sort_option", "Fastest")
-        if so == "Cheapest":
-            return (fare_sort, dur, chg, walk)
-        if so == "Least Walking":
-            return (walk, dur, chg)
-        return (dur, chg, walk)  # Fastest
-
-    sorted_journeys = sorted(journeys, key=sort_key)
-    st.caption(f"Sorted by **{st.session_state.get('sort_option', 'Fastest')}** · Showing **{len(sorted_journeys)}** routes")
-
-    # Render all journeys in chosen order
-    for idx, journey in enumerate(sorted_journeys, 1):
-        fp = fare_pence(journey)
+    st.radio("🔎 Sort results by", list(SORT_KEYS), key="sort_option", horizontal=True)
+
+    # Orders were computed at fetch time; the sort toggle just picks one
+    so = st.session_state.get("sort_option", "Fastest")
+    metrics = cached["metrics"]
+
+    # Routes beaten on every axis never top any sort order; hide them unless asked
+    front = cached["front"]
+    hidden = len(journeys) - len(front)
+    show_all = hidden > 0 and st.checkbox(f"Show {hidden} route(s) that are no better on journey time, arrival time, walking, fare or changes", key="show_all_routes")
+    order = cached["orders"].get(so, cached["orders"]["Fastest"])
+    if not show_all:
+        keep = set(front)
+        order = [i for i in order if i in keep]
+    st.caption(f"Sorted by **{so}** · Showing **{len(order)}** routes")
+
+    # Render in chosen order. Streamlit executes collapsed expander bodies too, so only
+    # the top route (and any the user asked for) build their leg-by-leg detail tree.
+    expanded_routes = st.session_state.expanded_routes
+    for idx, i in enumerate(order, 1):
+        journey, m = journeys[i], metrics[i]
+        fp = m["fare"]
         fare_header = f"£{fp/100:.2f}" if isinstance(fp, int) else "-"
-        walk_header = f"Walking {walking_minutes(journey)} mins"
+        walk_header = f"Walking {m['walking']} mins"
 
         with st.expander(f"🗺️ Route {idx} – {journey['duration']} mins • {fare_header} • {walk_header}", expanded=(idx == 1)):
-            # Convert ISO strings (UTC) → London time for display
-            arr_utc = datetime.fromisoformat(journey['arrivalDateTime'].replace('Z', '+00:00'))
-            dep_utc = datetime.fromisoformat(journey['startDateTime'].replace('Z', '+00:00'))
-            arr_uk = arr_utc.astimezone(UK_TZ)
-            dep_uk = dep_utc.astimezone(UK_TZ)
-
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("⏱️ Duration", f"{journey['duration']} mins")
-            with col2:
-                st.metric("🕐 Arrives", arr_uk.strftime("%H:%M"))
-            with col3:
-                st.metric("🔄 Changes", journey_changes(journey))
-            with col4:
-                st.metric("🚶 Walking", f"{walking_minutes(journey)} min")
-
-            st.caption(f"Date: {dep_uk.strftime('%a, %d %b %Y')} (London)")
-            st.markdown("---")
-
-            for leg_idx, leg in enumerate(journey.get("legs", []), 1):
-                mode_id = leg.get("mode", {}).get("id", "")
-                mode_name = leg.get("mode", {}).get("name", "Unknown")
-                mode_icons = {"tube": "🚇", "bus": "🚌", "walking": "🚶", "dlr": "🚊", "overground": "🚈", "elizabeth-line": "🚆", "national-rail": "🚂"}
-                icon = mode_icons.get(mode_id, "🚉")
-                st.markdown(f"### {icon} Step {leg_idx}: {mode_name.title()}")
-
-                if "departurePoint" in leg:
-                    st.write(f"**From:** {leg['departurePoint'].get('commonName', 'N/A')}")
-                if "instruction" in leg:
-                    st.write(f"*{leg['instruction'].get('summary', '')}*")
-                if leg.get("duration"):
-                    st.write(f"⏱️ {leg['duration']} minutes")
-                if "arrivalPoint" in leg:
-                    st.write(f"**To:** {leg['arrivalPoint'].get('commonName', 'N/A')}")
-
-                if leg_idx < len(journey.get("legs", [])):
-                    st.markdown("⬇️")
-
-            # Fare section with friendly fallback
-            st.markdown("---")
-            st.markdown("### 💷 Fare")
-            if isinstance(fp, int):
-                st.write(f"**Total:** £{fp/100:.2f}")
+            if idx == 1 or i in expanded_routes:
+                render_journey_details(journey, m)
             else:
-                st.write("Fare Information Not Available")
+                st.button("Show details", key=f"route_details_{i}", on_click=expanded_routes.add, args=(i,))
 
 elif not search_button:
     st.info("👈 Enter journey details to get started")